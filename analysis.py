@@ -0,0 +1,236 @@
+'''offline match analysis over a memory-mapped graph snapshot
+
+nothing in here talks to neo4j, point it at a file written by
+`flask export-snapshot` and it runs entirely locally
+'''
+from array import array
+from collections import Counter, defaultdict
+from multiprocessing import Pool
+
+from snapshot import read_snapshot
+
+
+DEFAULT_MAX_LENGTH = 8
+CHUNK_SIZE = 64
+
+_worker = {}
+
+
+def strongly_connected_components(graph_snapshot, alive=None):
+    '''iterative tarjan, returns (labels, number of components)
+
+    edges into nodes flagged 0 in `alive` are ignored, which leaves
+    those nodes in trivial components that no cycle can pass through
+    '''
+    indptr = graph_snapshot.indptr
+    indices = graph_snapshot.indices
+    num_nodes = graph_snapshot.num_nodes
+
+    index = array('i', [-1]) * num_nodes
+    lowlink = array('i', [0]) * num_nodes
+    labels = array('i', [-1]) * num_nodes
+    on_stack = bytearray(num_nodes)
+    stack = []
+    counter = 0
+    num_components = 0
+
+    for root in range(num_nodes):
+        if index[root] != -1:
+            continue
+
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = 1
+        work = [[root, indptr[root]]]
+
+        while work:
+            frame = work[-1]
+            node, edge = frame
+            if edge < indptr[node + 1]:
+                frame[1] += 1
+                target = indices[edge]
+                if alive is not None and not alive[target]:
+                    continue
+                if index[target] == -1:
+                    index[target] = lowlink[target] = counter
+                    counter += 1
+                    stack.append(target)
+                    on_stack[target] = 1
+                    work.append([target, indptr[target]])
+                elif on_stack[target] and index[target] < lowlink[node]:
+                    lowlink[node] = index[target]
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                if lowlink[node] < lowlink[parent]:
+                    lowlink[parent] = lowlink[node]
+
+            if lowlink[node] == index[node]:
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = 0
+                    labels[member] = num_components
+                    if member == node:
+                        break
+                num_components += 1
+
+    return labels, num_components
+
+
+def cycles_through(graph_snapshot, start, labels, max_length=DEFAULT_MAX_LENGTH, canonical=False):
+    '''yields every simple cycle through start as a list of node numbers
+
+    the closing edge back to start is implied. with canonical set, only
+    cycles whose smallest node is start are produced, so enumerating
+    from every node counts each cycle exactly once
+    '''
+    indptr = graph_snapshot.indptr
+    indices = graph_snapshot.indices
+    component = labels[start]
+
+    path = [start]
+    on_path = set(path)
+    work = [iter(range(indptr[start], indptr[start + 1]))]
+
+    while work:
+        for edge in work[-1]:
+            target = indices[edge]
+            if target == start:
+                yield list(path)
+                continue
+            if target in on_path or labels[target] != component:
+                continue
+            if canonical and target < start:
+                continue
+            if len(path) >= max_length:
+                continue
+            path.append(target)
+            on_path.add(target)
+            work.append(iter(range(indptr[target], indptr[target + 1])))
+            break
+        else:
+            work.pop()
+            on_path.discard(path.pop())
+
+
+def _init_worker(path, labels, max_length):
+    _worker['snapshot'] = read_snapshot(path)
+    _worker['labels'] = labels
+    _worker['max_length'] = max_length
+
+
+def _count_cycles(starts):
+    histogram = Counter()
+    for start in starts:
+        for cycle in cycles_through(_worker['snapshot'], start, _worker['labels'],
+                                    _worker['max_length'], canonical=True):
+            histogram[len(cycle)] += 1
+    return histogram
+
+
+def _find_matches(users):
+    # get_match needs at least one hop between the O and the N edge, so
+    # a user offering and needing the same proposal is not a match
+    graph_snapshot = _worker['snapshot']
+    results = []
+    for user in users:
+        name = graph_snapshot.name(user)
+        results.append((user, [
+            [graph_snapshot.name(node) for node in cycle] + [name]
+            for cycle in cycles_through(graph_snapshot, user, _worker['labels'], _worker['max_length'])
+            if len(cycle) >= 4]))
+    return results
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _pool_map(func, tasks, path, labels, max_length, processes):
+    pool = Pool(processes, initializer=_init_worker, initargs=(path, labels, max_length))
+    try:
+        for result in pool.imap_unordered(func, tasks):
+            yield result
+    finally:
+        pool.close()
+        pool.join()
+
+
+def analyse(path, max_length=DEFAULT_MAX_LENGTH, processes=None, now=None):
+    '''component and cycle statistics for a snapshot file
+
+    every cycle alternates users and proposals and users are numbered
+    first, so the smallest node of a cycle is always a user and only
+    users in non-trivial components need to be enumerated from.
+    proposals expired by `now` are counted but never part of a cycle
+    '''
+    graph_snapshot = read_snapshot(path)
+    try:
+        alive = graph_snapshot.alive(now)
+        labels, num_components = strongly_connected_components(graph_snapshot, alive)
+        sizes = Counter(labels)
+        num_users = graph_snapshot.num_users
+        stats = {
+            'nodes': graph_snapshot.num_nodes,
+            'edges': graph_snapshot.num_edges,
+            'users': num_users,
+            'expired_proposals': alive.count(0),
+            'components': num_components,
+            'non_trivial_components': sum(1 for size in sizes.values() if size > 1),
+            'largest_component': max(sizes.values()) if sizes else 0,
+            'component_size_histogram': dict(Counter(sizes.values())),
+        }
+    finally:
+        graph_snapshot.close()
+
+    starts = [user for user in range(num_users) if sizes[labels[user]] > 1]
+
+    cycle_lengths = Counter()
+    for histogram in _pool_map(_count_cycles, _chunks(starts, CHUNK_SIZE),
+                               path, labels, max_length, processes):
+        cycle_lengths.update(histogram)
+
+    stats['cycle_length_histogram'] = dict(cycle_lengths)
+    stats['cycles'] = sum(cycle_lengths.values())
+    return stats
+
+
+def match_users(path, user_ids, max_length=DEFAULT_MAX_LENGTH, processes=None, now=None):
+    '''matches for many users at once, keyed by the requested user id
+
+    users are grouped by component so each task walks a single
+    component, users in trivial components are answered without
+    enumerating anything. a match has the same shape as a get_match
+    row, but only simple cycles up to max_length edges are returned,
+    and none through proposals expired by `now`
+    '''
+    graph_snapshot = read_snapshot(path)
+    try:
+        labels, _ = strongly_connected_components(graph_snapshot, graph_snapshot.alive(now))
+        index = dict((str(name), node) for node, name in enumerate(graph_snapshot.users))
+    finally:
+        graph_snapshot.close()
+    sizes = Counter(labels)
+
+    matches = dict((user_id, []) for user_id in user_ids)
+    requested = defaultdict(list)
+    by_component = defaultdict(list)
+    for user_id in user_ids:
+        node = index.get(str(user_id))
+        if node is None or sizes[labels[node]] < 2:
+            continue
+        if node not in requested:
+            by_component[labels[node]].append(node)
+        requested[node].append(user_id)
+
+    tasks = [chunk for members in by_component.values() for chunk in _chunks(members, CHUNK_SIZE)]
+    for results in _pool_map(_find_matches, tasks, path, labels, max_length, processes):
+        for node, cycles in results:
+            for user_id in requested[node]:
+                matches[user_id] = [{'match': cycle} for cycle in cycles]
+
+    return matches
@@ -0,0 +1,53 @@
+from functools import wraps
+
+from flask import current_app, g, request
+from werkzeug.http import is_resource_modified
+
+from serializers import negotiate
+from versioning import read_version
+
+
+class GraphVersion(object):
+    '''a counter on a single :graph_version node, bumped by every write statement
+
+    read endpoints wrapped with `conditional` tag their responses with it
+    and answer 304 without running their query while it has not moved.
+    only an ETag is sent: a Last-Modified with whole-second resolution
+    could not tell apart two writes in the same second
+    '''
+
+    def __init__(self, db, app=None):
+        self.db = db
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('HTTP_CONDITIONAL_REQUESTS', True)
+
+    def current(self):
+        return read_version(self.db.read_graph)
+
+    def conditional(self, view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_app.config['HTTP_CONDITIONAL_REQUESTS']:
+                return view(*args, **kwargs)
+
+            # read before the view runs: a write landing in between gets a
+            # response tagged with the older version, which only means the
+            # client revalidates once more, never that it keeps stale data
+            version = g.graph_version = self.current()
+            mimetype = negotiate()
+            etag = '%s-%s' % (version, mimetype.rsplit('/', 1)[-1])
+
+            if not is_resource_modified(request.environ, etag=etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = view(*args, **kwargs)
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            response.vary.add('Accept')
+            return response
+        return wrapper
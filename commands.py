@@ -0,0 +1,116 @@
+import json
+import os
+import tempfile
+
+import click
+from flask import current_app
+
+from extensions import db, sweeper
+import snapshot
+import analysis
+from proposals import SWEEP_BATCH_SIZE
+import loadtest
+from loadtest import Workload
+
+
+def register_commands(app):
+
+    @app.cli.command('export-snapshot')
+    @click.argument('path')
+    def export_snapshot(path):
+        '''dump users, proposals and O/N edges to a binary snapshot'''
+        graph_snapshot = snapshot.load_graph(db.read_graph)
+        snapshot.write_snapshot(graph_snapshot, path)
+        click.echo('exported %d nodes and %d edges to %s' % (
+            graph_snapshot.num_nodes, graph_snapshot.num_edges, path))
+
+    @app.cli.command('import-snapshot')
+    @click.argument('path')
+    @click.option('--batch-size', default=snapshot.BATCH_SIZE, show_default=True)
+    def import_snapshot(path, batch_size):
+        '''bulk load a binary snapshot into the graph'''
+        graph_snapshot = snapshot.read_snapshot(path)
+        try:
+            snapshot.import_snapshot(db.graph, graph_snapshot, batch_size)
+        finally:
+            graph_snapshot.close()
+        click.echo('imported %d nodes and %d edges from %s' % (
+            graph_snapshot.num_nodes, graph_snapshot.num_edges, path))
+
+    @app.cli.command('analyse-snapshot')
+    @click.argument('path')
+    @click.option('--max-length', default=analysis.DEFAULT_MAX_LENGTH, show_default=True,
+                  help='longest cycle to enumerate, in edges')
+    @click.option('--processes', default=None, type=int, help='defaults to one per core')
+    def analyse_snapshot(path, max_length, processes):
+        '''offline cycle and component statistics for a snapshot'''
+        stats = analysis.analyse(path, max_length, processes)
+        click.echo(json.dumps(stats, indent=2, sort_keys=True))
+
+    @app.cli.command('batch-match')
+    @click.argument('user_ids', nargs=-1)
+    @click.option('--users-file', type=click.File(), help='one user id per line')
+    @click.option('--snapshot', 'path', help='match against an existing snapshot instead of the live graph')
+    @click.option('--max-length', default=analysis.DEFAULT_MAX_LENGTH, show_default=True,
+                  help='longest match to look for, in edges')
+    @click.option('--processes', default=None, type=int, help='defaults to one per core')
+    def batch_match(user_ids, users_file, path, max_length, processes):
+        '''get_match for many users across a process pool'''
+        user_ids = list(user_ids)
+        if users_file is not None:
+            user_ids.extend(line.strip() for line in users_file if line.strip())
+
+        if path is not None:
+            matches = analysis.match_users(path, user_ids, max_length, processes)
+        else:
+            fd, path = tempfile.mkstemp(suffix='.snap')
+            os.close(fd)
+            try:
+                snapshot.write_snapshot(snapshot.load_graph(db.read_graph), path)
+                matches = analysis.match_users(path, user_ids, max_length, processes)
+            finally:
+                os.remove(path)
+
+        click.echo(json.dumps(matches))
+
+    @app.cli.command('sweep-proposals')
+    @click.option('--batch-size', default=SWEEP_BATCH_SIZE, show_default=True)
+    @click.option('--every', type=float, help='keep sweeping every this many seconds instead of once')
+    def sweep_proposals(batch_size, every):
+        '''delete every proposal whose expiry has passed'''
+        if every:
+            sweeper.run(current_app._get_current_object(), every, batch_size)
+        click.echo('deleted %d expired proposals' % sweeper.sweep(batch_size))
+
+    @app.cli.command('loadtest')
+    @click.option('--url', help='load a running server instead of this app in process')
+    @click.option('--standin', is_flag=True, help='run in process against loadtest.GraphStandIn')
+    @click.option('--rates', default='50,100,200,400', show_default=True,
+                  help='comma separated target requests per second, one step each')
+    @click.option('--duration', default=10.0, show_default=True, help='seconds per step')
+    @click.option('--workers', default=32, show_default=True)
+    @click.option('--mix', default='create_proposal=2,get_match=5,list_proposal=3', show_default=True)
+    @click.option('--users', 'num_users', default=1000, show_default=True)
+    @click.option('--proposals', 'num_proposals', default=1000, show_default=True)
+    @click.option('--preload', default=0, help='proposals to create before the first step')
+    def run_loadtest(url, standin, rates, duration, workers, mix, num_users, num_proposals, preload):
+        '''step through request rates and report a saturation curve'''
+        mix = dict((name, float(weight)) for name, weight in
+                   (pair.split('=') for pair in mix.split(',')))
+        workload = Workload(mix, num_users, num_proposals)
+
+        if url is not None:
+            send = loadtest.http_sender(url)
+        else:
+            target = current_app._get_current_object()
+            if standin:
+                from factory import create_app
+                target = create_app({'PY2NEO_GRAPH': loadtest.GraphStandIn()})
+            send = loadtest.client_sender(target.test_client())
+
+        for _ in range(preload):
+            send(workload.create_proposal())
+
+        curve = loadtest.saturation_curve(
+            send, workload, [float(rate) for rate in rates.split(',')], duration, workers)
+        click.echo(loadtest.format_report(curve))
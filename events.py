@@ -0,0 +1,96 @@
+import json
+import socket
+import threading
+import time
+from collections import namedtuple
+
+from flask import current_app
+
+
+PROPOSAL_CREATED = 'proposal_created'
+PROPOSAL_DELETED = 'proposal_deleted'
+PROPOSAL_WITHDRAWN = 'proposal_withdrawn'
+PROPOSALS_EXPIRED = 'proposals_expired'
+
+
+MutationEvent = namedtuple('MutationEvent', ['seq', 'type', 'timestamp', 'payload'])
+
+
+class FileSink(object):
+    '''appends one json document per event, so consumers can tail the file'''
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, event):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(event._asdict()) + '\n')
+
+
+class SocketSink(object):
+    '''best-effort unix datagram sink, dropped events are not retried'''
+
+    def __init__(self, path):
+        self.path = path
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+
+    def __call__(self, event):
+        try:
+            self.sock.sendto(json.dumps(event._asdict()).encode('utf-8'), self.path)
+        except (OSError, socket.error):
+            pass
+
+
+class MutationFeed(object):
+    '''in-process publisher for graph writes
+
+    subscribers are called synchronously, in registration order,
+    after the write has gone through. by then the write is committed,
+    so a failing sink or subscriber is logged rather than raised
+    '''
+
+    def __init__(self, app=None):
+        self.subscribers = []
+        self._seq = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('MUTATION_FEED_PATH', None)
+        app.config.setdefault('MUTATION_FEED_SOCKET', None)
+
+        sinks = []
+        if app.config['MUTATION_FEED_PATH']:
+            sinks.append(FileSink(app.config['MUTATION_FEED_PATH']))
+        if app.config['MUTATION_FEED_SOCKET']:
+            sinks.append(SocketSink(app.config['MUTATION_FEED_SOCKET']))
+
+        app.extensions['mutation_feed'] = sinks
+
+    def subscribe(self, callback):
+        if callback not in self.subscribers:
+            self.subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        self.subscribers.remove(callback)
+
+    def publish(self, event_type, **payload):
+        # not `type`: proposal events carry a `type` of their own in the payload
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+        event = MutationEvent(seq, event_type, time.time(), payload)
+
+        for sink in current_app.extensions.get('mutation_feed', []):
+            self._deliver(sink, event)
+        for callback in list(self.subscribers):
+            self._deliver(callback, event)
+        return event
+
+    def _deliver(self, callback, event):
+        try:
+            callback(event)
+        except Exception:
+            current_app.logger.exception('mutation feed could not deliver %s event %d', event.type, event.seq)
@@ -1,5 +1,15 @@
-from flask_py2neo import Py2Neo
 from flask_bootstrap import Bootstrap
+from events import MutationFeed
+from matching import MatchIndex
+from proposals import ProposalSweeper
+from caching import GraphVersion
+from routing import RoutingPy2Neo
+from limits import ConcurrencyLimiter
 
-db = Py2Neo()
-bootstrap = Bootstrap()
\ No newline at end of file
+db = RoutingPy2Neo()
+bootstrap = Bootstrap()
+feed = MutationFeed()
+match_index = MatchIndex()
+sweeper = ProposalSweeper(db, feed)
+graph_version = GraphVersion(db)
+limiter = ConcurrencyLimiter()
\ No newline at end of file
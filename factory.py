@@ -1,18 +1,33 @@
 from flask import Flask
-from extensions import db, bootstrap
+from extensions import db, bootstrap, feed, match_index, sweeper, graph_version, limiter
 from views import bp
+from commands import register_commands
 
 
 def create_app(config=None):
     app = Flask(__name__)
     app.config.update({
-      'PY2NEO_HOST': 'db'    
+      'PY2NEO_HOST': 'db',
+      # (in flight, queued): get_match is the expensive one, cheap
+      # writes stay unlimited so they cannot be starved by it
+      'ROUTE_CONCURRENCY_LIMITS': {
+        'bp.get_match': (8, 16),
+        'bp.list_proposal': (16, 32),
+      }
     })
     app.config.update(config or {})
     
     db.init_app(app)
     bootstrap.init_app(app)
+    feed.init_app(app)
+    feed.subscribe(db.on_mutation)
+    match_index.init_app(app)
+    feed.subscribe(match_index.on_mutation)
+    sweeper.init_app(app)
+    graph_version.init_app(app)
+    limiter.init_app(app)
 
     app.register_blueprint(bp)
+    register_commands(app)
 
     return app
@@ -0,0 +1,76 @@
+import threading
+
+from flask import current_app, g, request
+
+from serializers import render
+
+
+class RouteLimit(object):
+    '''at most `concurrency` requests in flight and `queue_size` waiting
+
+    a request that finds the queue full, or waits longer than `timeout`
+    seconds for a slot, is refused straight away
+    '''
+
+    def __init__(self, concurrency, queue_size, timeout):
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.waiting = 0
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self._slots.acquire(False):
+            return True
+        with self._lock:
+            if self.waiting >= self.queue_size:
+                return False
+            self.waiting += 1
+        try:
+            return self._slots.acquire(timeout=self.timeout)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+
+    def release(self):
+        self._slots.release()
+
+
+class ConcurrencyLimiter(object):
+    '''per-endpoint limits from ROUTE_CONCURRENCY_LIMITS
+
+    maps endpoint names to (concurrency, queue size), requests that
+    cannot get a slot get a 503 with Retry-After instead of tying up a
+    worker and a database connection
+    '''
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ROUTE_CONCURRENCY_LIMITS', {})
+        app.config.setdefault('ROUTE_QUEUE_TIMEOUT', 1.0)
+        app.config.setdefault('ROUTE_RETRY_AFTER', 1)
+
+        app.extensions['concurrency_limits'] = dict(
+            (endpoint, RouteLimit(concurrency, queue_size, app.config['ROUTE_QUEUE_TIMEOUT']))
+            for endpoint, (concurrency, queue_size) in app.config['ROUTE_CONCURRENCY_LIMITS'].items())
+
+        app.before_request(self._acquire)
+        app.teardown_request(self._release)
+
+    def _acquire(self):
+        limit = current_app.extensions['concurrency_limits'].get(request.endpoint)
+        if limit is None:
+            return None
+        if not limit.acquire():
+            response = render({'error': 'too many concurrent %s requests' % request.endpoint}, status=503)
+            response.headers['Retry-After'] = str(current_app.config['ROUTE_RETRY_AFTER'])
+            return response
+        g._route_limit = limit
+
+    def _release(self, exc=None):
+        limit = g.pop('_route_limit', None)
+        if limit is not None:
+            limit.release()
@@ -0,0 +1,291 @@
+'''open-loop load generation and an in-process graph stand-in
+
+requests are fired on a fixed schedule whatever the latency, and each
+latency is measured from the moment the request was due, so queueing
+inside the harness shows up in the numbers instead of hiding them.
+stepping the target rate up gives a saturation curve
+'''
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+from versioning import BUMP_VERSION
+
+
+DEFAULT_MIX = {'create_proposal': 2, 'get_match': 5, 'list_proposal': 3}
+MAX_MATCH_LENGTH = 8
+
+
+class UnknownStatement(ValueError):
+    pass
+
+
+class Cursor(object):
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def data(self):
+        return self.rows
+
+    def evaluate(self):
+        if not self.rows:
+            return None
+        return next(iter(self.rows[0].values()))
+
+
+class Transaction(object):
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def run(self, statement, parameters=None, **kwparameters):
+        return self.graph.run(statement, parameters, **kwparameters)
+
+    def commit(self):
+        pass
+
+
+class GraphStandIn(object):
+    '''answers the queries this app issues from plain python structures
+
+    statements are recognised by their leading text, so this has to be
+    kept in step with the queries in views, versioning and snapshot.
+    anything it does not recognise raises UnknownStatement, rather than
+    quietly returning nothing. get_match here returns simple cycles only
+    '''
+
+    def __init__(self):
+        self.offers = defaultdict(set)
+        self.needs = defaultdict(set)
+        self.users = set()
+        self.proposals = {}
+        self.version = 0
+        self._lock = threading.RLock()
+        self._handlers = [
+            ("MERGE (U1:user{name:$user_id})", self._create_offer),
+            ("MERGE (U:user{name:$user_id})", self._create_need),
+            ("MATCH (R:proposal{name:$proposal_id}) DETACH DELETE R", self._delete),
+            ("MATCH (U:user{name:$user_id})-[r:O|N]-", self._withdraw),
+            ("MATCH m=(a:user)", self._match),
+            ("MATCH (n:proposal) WHERE", self._list),
+            ("MATCH (v:graph_version)", self._version),
+            ("MATCH (u:user) RETURN", self._users),
+            ("MATCH (p:proposal) WHERE", self._proposals),
+            ("MATCH (u:user)-[:O]->", self._offer_rows),
+            ("MATCH (p:proposal)-[:N]->", self._need_rows),
+            ("RETURN 1", lambda params: [{'1': 1}]),
+        ]
+
+    def begin(self):
+        return Transaction(self)
+
+    def run(self, statement, parameters=None, **kwparameters):
+        params = dict(parameters or {}, **kwparameters)
+        for prefix, handler in self._handlers:
+            if statement.startswith(prefix):
+                with self._lock:
+                    rows = handler(params)
+                    if BUMP_VERSION in statement:
+                        self.version += 1
+                        rows = [{'version': self.version}]
+                    return Cursor(rows)
+        raise UnknownStatement('graph stand-in does not know %r' % statement)
+
+    def _proposal(self, params):
+        self.users.add(params['user_id'])
+        self.proposals.setdefault(params['proposal_id'], None)
+        if params.get('expires_at') is not None:
+            self.proposals[params['proposal_id']] = params['expires_at']
+
+    def _create_offer(self, params):
+        self._proposal(params)
+        self.offers[params['user_id']].add(params['proposal_id'])
+        return []
+
+    def _create_need(self, params):
+        self._proposal(params)
+        self.needs[params['proposal_id']].add(params['user_id'])
+        return []
+
+    def _delete(self, params):
+        proposal = params['proposal_id']
+        self.proposals.pop(proposal, None)
+        self.needs.pop(proposal, None)
+        for proposals in self.offers.values():
+            proposals.discard(proposal)
+        return []
+
+    def _withdraw(self, params):
+        self.offers[params['user_id']].discard(params['proposal_id'])
+        self.needs[params['proposal_id']].discard(params['user_id'])
+        return []
+
+    def _live(self, proposal, now):
+        expiry = self.proposals.get(proposal)
+        return expiry is None or expiry > now
+
+    def _match(self, params):
+        start = params['user_id']
+        now = params['now']
+        rows = []
+        path = [start]
+        users_on_path = set(path)
+
+        def walk(user):
+            for proposal in self.offers.get(user, ()):
+                if not self._live(proposal, now):
+                    continue
+                for next_user in self.needs.get(proposal, ()):
+                    if next_user == start:
+                        if len(path) > 1 and len(path) + 1 <= MAX_MATCH_LENGTH:
+                            rows.append({'match': path + [proposal, start]})
+                    elif next_user not in users_on_path and len(path) + 3 <= MAX_MATCH_LENGTH:
+                        path.extend([proposal, next_user])
+                        users_on_path.add(next_user)
+                        walk(next_user)
+                        users_on_path.discard(path.pop())
+                        path.pop()
+
+        walk(start)
+        return rows
+
+    def _list(self, params):
+        return [{'name': name, 'expires_at': expiry}
+                for name, expiry in self.proposals.items() if self._live(name, params['now'])][:25]
+
+    def _version(self, params):
+        if not self.version:
+            return []
+        return [{'value': self.version}]
+
+    def _users(self, params):
+        return [{'name': name} for name in self.users]
+
+    def _proposals(self, params):
+        return [{'name': name, 'expires_at': expiry}
+                for name, expiry in self.proposals.items() if self._live(name, params['now'])]
+
+    def _offer_rows(self, params):
+        return [{'src': user, 'dst': proposal, 'expires_at': self.proposals.get(proposal)}
+                for user, proposals in self.offers.items() for proposal in proposals
+                if self._live(proposal, params['now'])]
+
+    def _need_rows(self, params):
+        return [{'src': proposal, 'dst': user, 'expires_at': self.proposals.get(proposal)}
+                for proposal, users in self.needs.items() for user in users
+                if self._live(proposal, params['now'])]
+
+
+class Workload(object):
+    '''random request paths drawn from a weighted mix of endpoints'''
+
+    def __init__(self, mix=None, num_users=1000, num_proposals=1000, seed=None):
+        self.mix = mix or DEFAULT_MIX
+        self.num_users = num_users
+        self.num_proposals = num_proposals
+        self.random = random.Random(seed)
+        self._names = list(self.mix)
+        self._weights = [self.mix[name] for name in self._names]
+
+    def create_proposal(self):
+        return '/create_proposal/%d/%d/%s' % (
+            self.random.randint(1, self.num_users), self.random.randint(1, self.num_proposals),
+            self.random.choice(('offer', 'need')))
+
+    def get_match(self):
+        return '/get_match/%d' % self.random.randint(1, self.num_users)
+
+    def list_proposal(self):
+        return '/list_proposal'
+
+    def next(self):
+        name = self.random.choices(self._names, self._weights)[0]
+        return name, getattr(self, name)()
+
+
+def client_sender(client):
+    '''sends through a flask test client, in process'''
+    def send(path):
+        return client.get(path).status_code
+    return send
+
+
+def http_sender(base_url, timeout=30):
+    def send(path):
+        try:
+            with urlopen(base_url.rstrip('/') + path, timeout=timeout) as response:
+                response.read()
+                return response.status
+        except HTTPError as error:
+            return error.code
+    return send
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def run_step(send, workload, rate, duration, workers):
+    '''fires requests at `rate` per second for `duration` seconds'''
+    latencies = defaultdict(list)
+    statuses = defaultdict(int)
+    lock = threading.Lock()
+
+    def fire(name, path, due):
+        try:
+            status = send(path)
+        except Exception:
+            status = 'error'
+        latency = time.time() - due
+        with lock:
+            latencies[name].append(latency)
+            statuses[status] += 1
+
+    interval = 1.0 / rate
+    total = int(rate * duration)
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for i in range(total):
+            due = started + i * interval
+            delay = due - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            name, path = workload.next()
+            pool.submit(fire, name, path, due)
+    elapsed = time.time() - started
+
+    everything = [latency for values in latencies.values() for latency in values]
+    return {
+        'target_rps': rate,
+        'achieved_rps': len(everything) / elapsed if elapsed else 0.0,
+        'p50': percentile(everything, 0.50),
+        'p95': percentile(everything, 0.95),
+        'p99': percentile(everything, 0.99),
+        'errors': sum(count for status, count in statuses.items()
+                      if status == 'error' or status >= 500),
+        'statuses': dict(statuses),
+        'by_endpoint': dict((name, {'count': len(values), 'p95': percentile(values, 0.95)})
+                            for name, values in latencies.items()),
+    }
+
+
+def saturation_curve(send, workload, rates, duration, workers):
+    return [run_step(send, workload, rate, duration, workers) for rate in rates]
+
+
+def format_report(rows):
+    lines = ['%10s %12s %9s %9s %9s %8s' % ('target', 'achieved', 'p50 ms', 'p95 ms', 'p99 ms', 'errors')]
+    for row in rows:
+        lines.append('%10d %12.1f %9.1f %9.1f %9.1f %8d' % (
+            row['target_rps'], row['achieved_rps'],
+            1000 * (row['p50'] or 0), 1000 * (row['p95'] or 0), 1000 * (row['p99'] or 0),
+            row['errors']))
+    return '\n'.join(lines)
@@ -0,0 +1,234 @@
+'''strongly connected components of the offer/need graph
+
+every match returned by get_match is a cycle through the user, so a
+user whose component is trivial can never match and a match can never
+leave the user's component. nodes are keyed as ('user', name) and
+('proposal', name), with names as they are stored in the graph.
+
+a labelling is only trusted at the graph version it was built from.
+writes made in this process move it along one version at a time, a
+write made anywhere else leaves it behind until the next reload
+'''
+import threading
+import time
+from collections import defaultdict
+
+from flask import current_app
+
+from events import PROPOSAL_CREATED
+from snapshot import load_graph
+from analysis import strongly_connected_components
+from versioning import read_version
+
+
+USER = 'user'
+PROPOSAL = 'proposal'
+
+
+def edge_for(type, user_id, proposal_id):
+    user = (USER, user_id)
+    proposal = (PROPOSAL, proposal_id)
+    if type == 'offer':
+        return user, proposal
+    return proposal, user
+
+
+class ComponentIndex(object):
+    '''in-memory scc labelling of the graph at `version`
+
+    events that arrive while a reload is reading the graph are held back
+    and applied once the new labelling is in place, so the reset cannot
+    wipe them
+    '''
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._pending = None
+        self.loaded_at = None
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.successors = defaultdict(set)
+            self.predecessors = defaultdict(set)
+            self.labels = {}
+            self.components = {}
+            self._next_label = 0
+            self.version = None
+            self._ahead = set()
+
+    @property
+    def loaded(self):
+        return self.version is not None
+
+    def due(self, interval):
+        if self._pending is not None:
+            return False
+        return self.loaded_at is None or time.time() - self.loaded_at >= interval
+
+    def load(self, graph_snapshot, version):
+        '''`version` has to be read before the snapshot is'''
+        labels, num_components = strongly_connected_components(graph_snapshot)
+        keys = [(USER, name) for name in graph_snapshot.users]
+        keys.extend((PROPOSAL, name) for name in graph_snapshot.proposals)
+
+        with self._lock:
+            pending, self._pending = self._pending or [], None
+            self.reset()
+            for node, key in enumerate(keys):
+                self.labels[key] = labels[node]
+                self.components.setdefault(labels[node], set()).add(key)
+                for target in graph_snapshot.neighbours(node):
+                    self.successors[key].add(keys[target])
+                    self.predecessors[keys[target]].add(key)
+            self._next_label = num_components
+            self.version = version
+            self.loaded_at = time.time()
+            for event in pending:
+                self.apply(event)
+
+    def reload(self, graph):
+        '''reads the whole graph again, unless another thread already is'''
+        with self._lock:
+            if self._pending is not None:
+                return
+            self._pending = []
+            self.loaded_at = time.time()
+        try:
+            version = read_version(graph)
+            graph_snapshot = load_graph(graph)
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+        self.load(graph_snapshot, version)
+
+    def _add_node(self, key):
+        if key not in self.labels:
+            self.labels[key] = self._next_label
+            self.components[self._next_label] = set([key])
+            self._next_label += 1
+
+    def _reachable(self, start, edges):
+        seen = set([start])
+        stack = [start]
+        while stack:
+            for neighbour in edges.get(stack.pop(), ()):
+                if neighbour not in seen:
+                    seen.add(neighbour)
+                    stack.append(neighbour)
+        return seen
+
+    def add_edge(self, source, target):
+        '''source -> target closes a cycle iff target already reaches source,
+        in which case everything on a target ~> source path joins one component
+        '''
+        with self._lock:
+            self._add_node(source)
+            self._add_node(target)
+            if target in self.successors[source]:
+                return
+            self.successors[source].add(target)
+            self.predecessors[target].add(source)
+
+            if self.labels[source] == self.labels[target]:
+                return
+
+            forward = self._reachable(target, self.successors)
+            if source not in forward:
+                return
+            merged = forward & self._reachable(source, self.predecessors)
+
+            label = self.labels[source]
+            for old_label in set(self.labels[key] for key in merged):
+                if old_label == label:
+                    continue
+                for key in self.components.pop(old_label):
+                    self.labels[key] = label
+                    self.components[label].add(key)
+
+    def component(self, user_id, version=None):
+        '''(user names, proposal names) sharing the user's component
+
+        both are empty when the component is trivial. None when `version`
+        is given and the labelling is not at it, since then it cannot
+        vouch for anything
+        '''
+        with self._lock:
+            if version is not None and version != self.version:
+                return None
+            label = self.labels.get((USER, user_id))
+            if label is None or len(self.components[label]) < 2:
+                return [], []
+            members = self.components[label]
+            return ([name for kind, name in members if kind == USER],
+                    [name for kind, name in members if kind == PROPOSAL])
+
+    def apply(self, event):
+        # removing edges can only split components, so deletions just move
+        # the version: the labelling over-approximates until the next
+        # reload, which costs some pruning but never drops a match
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(event)
+                return
+            if not self.loaded:
+                return
+            payload = event.payload
+            if event.type == PROPOSAL_CREATED:
+                self.add_edge(*edge_for(payload['type'], payload['user_id'], payload['proposal_id']))
+            # versions can be published out of order by concurrent requests,
+            # so later ones wait in _ahead until the gap before them closes
+            version = payload.get('version')
+            if version is not None and version > self.version:
+                self._ahead.add(version)
+                while self.version + 1 in self._ahead:
+                    self.version += 1
+                    self._ahead.discard(self.version)
+
+
+class MatchIndex(object):
+    '''keeps one ComponentIndex per app in app.extensions
+
+    an index that is behind the graph is reloaded on a background thread
+    started by the request that notices, at most every
+    MATCH_INDEX_RELOAD_INTERVAL seconds. until the reload lands
+    `component` answers None and get_match runs unfiltered
+    '''
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('MATCH_SCC_PREFILTER', True)
+        app.config.setdefault('MATCH_INDEX_RELOAD_INTERVAL', 60)
+        app.config.setdefault('MATCH_COMPONENT_FILTER_LIMIT', 200)
+        app.extensions['match_index'] = ComponentIndex()
+
+    @property
+    def index(self):
+        return current_app.extensions['match_index']
+
+    def component(self, user_id, version, graph):
+        index = self.index
+        if index.version != version and index.due(current_app.config['MATCH_INDEX_RELOAD_INTERVAL']):
+            self._reload(current_app._get_current_object(), index, graph)
+        return index.component(user_id, version)
+
+    def _reload(self, app, index, graph):
+        # off the request path: reading the whole graph and labelling it
+        # takes far longer than the unfiltered query it would save
+        def run():
+            try:
+                index.reload(graph)
+            except Exception:
+                app.logger.exception('match index reload failed')
+
+        thread = threading.Thread(target=run, name='match-index-reload')
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def on_mutation(self, event):
+        self.index.apply(event)
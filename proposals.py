@@ -0,0 +1,76 @@
+import time
+
+from events import PROPOSALS_EXPIRED
+
+
+SWEEP_BATCH_SIZE = 1000
+
+
+def expires_at(ttl, now=None):
+    if ttl is None:
+        return None
+    return (now or time.time()) + float(ttl)
+
+
+def sweep_expired(graph, batch_size=SWEEP_BATCH_SIZE, now=None):
+    '''deletes expired proposals one batch per transaction
+
+    yields (names, graph version) for each non-empty batch. the version
+    is only bumped when something was deleted, so an idle sweep does
+    not invalidate every cached read
+    '''
+    now = now or time.time()
+    while True:
+        row = graph.run((
+            "MATCH (R:proposal) WHERE R.expires_at <= $now "
+            "WITH R LIMIT $batch_size "
+            "WITH collect(R) AS expired, collect(R.name) AS names "
+            "FOREACH (r IN expired | DETACH DELETE r) "
+            "FOREACH (_ IN CASE WHEN size(names) > 0 THEN [1] ELSE [] END | "
+            "MERGE (v:graph_version) SET v.value = coalesce(v.value, 0) + 1) "
+            "WITH names OPTIONAL MATCH (v:graph_version) "
+            "RETURN names, v.value AS version"
+        ), now=now, batch_size=batch_size).data()
+        names = row[0]['names'] if row else []
+        if names:
+            yield names, row[0]['version']
+        if len(names) < batch_size:
+            return
+
+
+class ProposalSweeper(object):
+    '''removes expired proposals, once with `sweep` or periodically with `run`
+
+    nothing is started by init_app, run `flask sweep-proposals --every`
+    next to the web workers to keep sweeping
+    '''
+
+    def __init__(self, db, feed, app=None):
+        self.db = db
+        self.feed = feed
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PROPOSAL_TTL', None)
+        app.config.setdefault('PROPOSAL_SWEEP_INTERVAL', 60)
+        app.config.setdefault('PROPOSAL_SWEEP_BATCH_SIZE', SWEEP_BATCH_SIZE)
+
+    def sweep(self, batch_size=SWEEP_BATCH_SIZE):
+        deleted = 0
+        for names, version in sweep_expired(self.db.graph, batch_size):
+            self.feed.publish(PROPOSALS_EXPIRED, proposal_ids=names, version=version)
+            deleted += len(names)
+        return deleted
+
+    def run(self, app, interval=None, batch_size=None):
+        '''sweeps every `interval` seconds until the process exits'''
+        interval = interval or app.config['PROPOSAL_SWEEP_INTERVAL']
+        batch_size = batch_size or app.config['PROPOSAL_SWEEP_BATCH_SIZE']
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    self.sweep(batch_size)
+                except Exception:
+                    app.logger.exception('proposal sweep failed')
@@ -0,0 +1,155 @@
+import itertools
+import socket
+import threading
+import time
+
+from flask import current_app, g
+from flask_py2neo import Py2Neo
+from py2neo import Graph
+
+
+# flask-py2neo config keys and the py2neo Graph settings they map to
+GRAPH_SETTINGS = {
+    'PY2NEO_BOLT': 'bolt',
+    'PY2NEO_SECURE': 'secure',
+    'PY2NEO_HTTP_PORT': 'http_port',
+    'PY2NEO_HTTPS_PORT': 'https_port',
+    'PY2NEO_BOLT_PORT': 'bolt_port',
+    'PY2NEO_USER': 'user',
+    'PY2NEO_PASSWORD': 'password',
+}
+
+
+class Replica(object):
+    '''a read replica and the outcome of its last health check
+
+    checks run on the pool's background threads, never on a request. a
+    replica counts as available only while its last check passed and is
+    recent, so one whose check hangs drops out after two intervals
+    '''
+
+    def __init__(self, host, settings, timeout):
+        self.host = host
+        self.settings = settings
+        self.timeout = timeout
+        if settings.get('secure'):
+            self.port = settings.get('https_port', 7473)
+        else:
+            self.port = settings.get('http_port', 7474)
+        self.graph = None
+        self.healthy = False
+        self.checked_at = None
+        self._lock = threading.Lock()
+
+    def available(self, interval):
+        '''the replica's Graph, or None if it is not fit to read from'''
+        with self._lock:
+            if self.healthy and time.time() - self.checked_at < 2 * interval:
+                return self.graph
+            return None
+
+    def check(self, logger):
+        # py2neo has no connect timeout of its own, so a plain connect
+        # weeds out replicas that are down before it gets to try
+        graph = self.graph
+        try:
+            socket.create_connection((self.host, self.port), self.timeout).close()
+            if graph is None:
+                graph = Graph(host=self.host, **self.settings)
+            graph.run("RETURN 1").evaluate()
+        except Exception:
+            logger.warning('read replica %s failed its health check', self.host)
+            graph = None
+        with self._lock:
+            self.graph = graph
+            self.healthy = graph is not None
+            self.checked_at = time.time()
+
+
+class ReplicaPool(object):
+    '''round robin over the available replicas
+
+    each replica is checked every `interval` seconds on a daemon thread of
+    its own, so a hung replica only stalls its own checks. the threads
+    start on first use, in the process that serves the requests, and
+    until the first checks pass reads go to the primary
+    '''
+
+    def __init__(self, replicas, interval, logger):
+        self.replicas = replicas
+        self.interval = interval
+        self.logger = logger
+        self._cycle = itertools.cycle(replicas)
+        self._lock = threading.Lock()
+        self._started = False
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for replica in self.replicas:
+            thread = threading.Thread(target=self._watch, args=(replica,),
+                                      name='replica-check-%s' % replica.host)
+            thread.daemon = True
+            thread.start()
+
+    def _watch(self, replica):
+        while True:
+            replica.check(self.logger)
+            time.sleep(self.interval)
+
+    def next(self):
+        self.start()
+        for _ in self.replicas:
+            with self._lock:
+                replica = next(self._cycle)
+            graph = replica.available(self.interval)
+            if graph is not None:
+                return graph
+        return None
+
+
+class RoutingPy2Neo(Py2Neo):
+    '''Py2Neo with read replicas
+
+    `graph` is always the primary. `read_graph` picks one healthy replica
+    per request from PY2NEO_READ_REPLICAS and sticks to it, so every read
+    in a request sees the same snapshot. once the request has written
+    (any mutation event), reads go to the primary to see their own writes.
+    with no replicas configured, or none healthy, `read_graph` is the primary
+    '''
+
+    def init_app(self, app):
+        super(RoutingPy2Neo, self).init_app(app)
+        app.config.setdefault('PY2NEO_GRAPH', None)
+        app.config.setdefault('PY2NEO_READ_REPLICAS', [])
+        app.config.setdefault('PY2NEO_REPLICA_CHECK_INTERVAL', 10)
+        app.config.setdefault('PY2NEO_REPLICA_CONNECT_TIMEOUT', 2)
+
+        settings = dict((setting, app.config[key]) for key, setting in GRAPH_SETTINGS.items()
+                        if app.config.get(key) is not None)
+        replicas = [Replica(host, settings, app.config['PY2NEO_REPLICA_CONNECT_TIMEOUT'])
+                    for host in app.config['PY2NEO_READ_REPLICAS']]
+        app.extensions['py2neo_replicas'] = ReplicaPool(
+            replicas, app.config['PY2NEO_REPLICA_CHECK_INTERVAL'], app.logger)
+
+    @property
+    def graph(self):
+        '''PY2NEO_GRAPH replaces the connection outright, see loadtest.GraphStandIn'''
+        graph = current_app.config.get('PY2NEO_GRAPH')
+        if graph is not None:
+            return graph
+        return super(RoutingPy2Neo, self).graph
+
+    @property
+    def read_graph(self):
+        if g.get('_py2neo_wrote'):
+            return self.graph
+        if g.get('_py2neo_read_graph') is None:
+            pool = current_app.extensions['py2neo_replicas']
+            g._py2neo_read_graph = (pool.next() if pool.replicas else None) or self.graph
+        return g._py2neo_read_graph
+
+    def on_mutation(self, event):
+        g._py2neo_wrote = True
@@ -0,0 +1,76 @@
+import math
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+
+OFFER = 'offer'
+NEED = 'need'
+PROPOSAL_TYPES = (OFFER, NEED)
+ID_PATTERN = re.compile(r'-?[0-9]+')
+# neo4j integers and orjson are both 64 bit
+MIN_ID = -2 ** 63
+MAX_ID = 2 ** 63 - 1
+
+
+class ValidationError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class ProposalRequest:
+    user_id: int
+    proposal_id: int
+    type: str
+    ttl: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class Proposal:
+    name: int
+    expires_at: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class ProposalRow:
+    '''one list_proposal row, keyed like the cypher column it comes from'''
+    n: Proposal
+
+
+@dataclass(frozen=True)
+class Match:
+    match: List[int]
+
+
+def parse_id(value, field):
+    '''ids end up as integer node names, anything else is rejected up front
+
+    int() on its own would also let through padding, underscores and
+    non-ascii digits
+    '''
+    if not isinstance(value, str) or not ID_PATTERN.fullmatch(value):
+        raise ValidationError('%s must be an integer, got %r' % (field, value))
+    number = int(value)
+    if not MIN_ID <= number <= MAX_ID:
+        raise ValidationError('%s must fit in 64 bits, got %r' % (field, value))
+    return number
+
+
+def parse_ttl(value):
+    if value is None:
+        return None
+    try:
+        ttl = float(value)
+    except (TypeError, ValueError):
+        raise ValidationError('ttl must be a number of seconds, got %r' % (value,))
+    # nan would never compare as expired and inf is not valid json
+    if not math.isfinite(ttl) or ttl <= 0:
+        raise ValidationError('ttl must be a positive, finite number of seconds, got %r' % (value,))
+    return ttl
+
+
+def parse_proposal(user_id, proposal_id, type, ttl=None):
+    '''the ids have already been through parse_id, see views.parse_ids'''
+    if type not in PROPOSAL_TYPES:
+        raise ValidationError('type must be one of %s, got %r' % (', '.join(PROPOSAL_TYPES), type))
+    return ProposalRequest(user_id, proposal_id, type, parse_ttl(ttl))
@@ -0,0 +1,80 @@
+'''response encoding
+
+json goes through orjson when it is installed and stdlib json otherwise.
+clients sending `Accept: application/x-msgpack` get msgpack instead,
+when msgpack is installed
+'''
+import json
+from dataclasses import fields, is_dataclass
+
+from flask import current_app, request
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/x-msgpack'
+
+_encoders = {}
+
+
+def compile_encoder(cls):
+    '''builds a dict-producing encoder for a dataclass once, instead of
+    walking its fields with asdict on every instance'''
+    names = tuple(field.name for field in fields(cls))
+
+    def encode(obj):
+        return dict((name, getattr(obj, name)) for name in names)
+
+    _encoders[cls] = encode
+    return encode
+
+
+def encode_default(obj):
+    encode = _encoders.get(type(obj))
+    if encode is None:
+        if not is_dataclass(obj):
+            raise TypeError('%r is not serializable' % (obj,))
+        encode = compile_encoder(type(obj))
+    return encode(obj)
+
+
+def dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, default=encode_default, separators=(',', ':')).encode('utf-8')
+
+
+def iter_msgpack(payload):
+    '''packs top-level lists item by item so the body is never built in one piece'''
+    packer = msgpack.Packer(default=encode_default, use_bin_type=True)
+    if not isinstance(payload, list):
+        yield packer.pack(payload)
+        return
+    yield packer.pack_array_header(len(payload))
+    for item in payload:
+        yield packer.pack(item)
+
+
+def negotiate():
+    if msgpack is None:
+        return JSON_MIMETYPE
+    return request.accept_mimetypes.best_match([JSON_MIMETYPE, MSGPACK_MIMETYPE], JSON_MIMETYPE)
+
+
+def render(payload, status=200):
+    mimetype = negotiate()
+    if mimetype == MSGPACK_MIMETYPE:
+        response = current_app.response_class(iter_msgpack(payload), status=status, mimetype=mimetype)
+    else:
+        response = current_app.response_class(dumps(payload), status=status, mimetype=mimetype)
+    response.vary.add('Accept')
+    return response
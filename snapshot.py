@@ -0,0 +1,256 @@
+'''compact binary snapshots of the user/proposal graph
+
+layout (little-endian):
+
+    magic       8 bytes, b'CRFTSNP2'
+    header      uint32 num_users, num_proposals, num_edges, names_length
+    indptr      int32[num_nodes + 1]
+    indices     int32[num_edges]
+    names       utf-8 json object: "names", users first then proposals,
+                and "expires_at", one expiry or null per proposal
+
+files written before expiries were kept (b'CRFTSNP1') have a plain
+json list of names and read back with no expiries.
+
+nodes are numbered users first, so every edge leaving a user is an
+O edge and every edge leaving a proposal is an N edge. the two int32
+arrays are a CSR adjacency and can be memory-mapped as they are.
+'''
+import json
+import mmap
+import struct
+import sys
+import time
+from array import array
+
+from versioning import bumping
+
+
+MAGIC = b'CRFTSNP2'
+MAGIC_WITHOUT_EXPIRY = b'CRFTSNP1'
+HEADER = struct.Struct('<IIII')
+BATCH_SIZE = 10000
+
+
+class Snapshot(object):
+
+    def __init__(self, users, proposals, indptr, indices, buffer=None, expires_at=None):
+        self.users = users
+        self.proposals = proposals
+        self.expires_at = expires_at if expires_at is not None else [None] * len(proposals)
+        self.indptr = indptr
+        self.indices = indices
+        self._buffer = buffer
+
+    @property
+    def num_users(self):
+        return len(self.users)
+
+    @property
+    def num_nodes(self):
+        return len(self.users) + len(self.proposals)
+
+    @property
+    def num_edges(self):
+        return len(self.indices)
+
+    def name(self, node):
+        if node < self.num_users:
+            return self.users[node]
+        return self.proposals[node - self.num_users]
+
+    def alive(self, now=None):
+        '''one byte per node, 0 for proposals that have expired by `now`'''
+        now = now or time.time()
+        flags = bytearray([1]) * self.num_nodes
+        for i, expiry in enumerate(self.expires_at):
+            if expiry is not None and expiry <= now:
+                flags[self.num_users + i] = 0
+        return flags
+
+    def neighbours(self, node):
+        '''a tuple, so no slice of the mapped buffer outlives close()'''
+        indices = self.indices
+        return tuple(indices[i] for i in range(self.indptr[node], self.indptr[node + 1]))
+
+    def edges(self):
+        '''yields (kind, source name, target name) tuples'''
+        for node in range(self.num_nodes):
+            kind = 'O' if node < self.num_users else 'N'
+            for target in self.neighbours(node):
+                yield kind, self.name(node), self.name(target)
+
+    def close(self):
+        if self._buffer is not None:
+            self.indptr.release()
+            self.indices.release()
+            self._buffer.close()
+            self._buffer = None
+
+
+def build_csr(num_nodes, edges):
+    '''edges is a list of (source, target) node numbers'''
+    indptr = array('i', [0] * (num_nodes + 1))
+    for source, _ in edges:
+        indptr[source + 1] += 1
+    for node in range(num_nodes):
+        indptr[node + 1] += indptr[node]
+
+    indices = array('i', [0] * len(edges))
+    cursor = array('i', indptr[:-1])
+    for source, target in sorted(edges):
+        indices[cursor[source]] = target
+        cursor[source] += 1
+
+    return indptr, indices
+
+
+def from_rows(users, proposals, offers, needs, expires_at=None):
+    '''builds a snapshot from names and (user, proposal) / (proposal, user) name pairs'''
+    users = list(users)
+    proposals = list(proposals)
+    user_ids = dict((name, i) for i, name in enumerate(users))
+    proposal_ids = dict((name, len(users) + i) for i, name in enumerate(proposals))
+
+    edges = [(user_ids[u], proposal_ids[p]) for u, p in offers]
+    edges.extend((proposal_ids[p], user_ids[u]) for p, u in needs)
+
+    indptr, indices = build_csr(len(users) + len(proposals), edges)
+    return Snapshot(users, proposals, indptr, indices, expires_at=expires_at)
+
+
+def _including(names, extra):
+    seen = set(names)
+    for name in extra:
+        if name not in seen:
+            seen.add(name)
+            names.append(name)
+    return names
+
+
+def load_graph(graph, now=None):
+    '''reads the live part of the offer/need graph out of neo4j
+
+    proposals that have expired by `now` are left out, as get_match
+    would leave them out. the four reads are not one snapshot, so an
+    edge written after the node reads can name a node they did not
+    return. such nodes are added rather than the edge dropped
+    '''
+    now = now or time.time()
+    live = "(p.expires_at IS NULL OR p.expires_at > $now)"
+    users = [r['name'] for r in graph.run("MATCH (u:user) RETURN u.name AS name").data()]
+    proposal_rows = graph.run(
+        "MATCH (p:proposal) WHERE " + live + " RETURN p.name AS name, p.expires_at AS expires_at",
+        now=now).data()
+    offer_rows = graph.run(
+        "MATCH (u:user)-[:O]->(p:proposal) WHERE " + live + " "
+        "RETURN u.name AS src, p.name AS dst, p.expires_at AS expires_at", now=now).data()
+    need_rows = graph.run(
+        "MATCH (p:proposal)-[:N]->(u:user) WHERE " + live + " "
+        "RETURN p.name AS src, u.name AS dst, p.expires_at AS expires_at", now=now).data()
+
+    offers = [(r['src'], r['dst']) for r in offer_rows]
+    needs = [(r['src'], r['dst']) for r in need_rows]
+    expiry = dict((r['name'], r['expires_at']) for r in proposal_rows)
+    expiry.update((r['dst'], r['expires_at']) for r in offer_rows)
+    expiry.update((r['src'], r['expires_at']) for r in need_rows)
+
+    _including(users, [u for u, _ in offers] + [u for _, u in needs])
+    proposals = _including([r['name'] for r in proposal_rows], [p for _, p in offers] + [p for p, _ in needs])
+    return from_rows(users, proposals, offers, needs, [expiry[p] for p in proposals])
+
+
+def write_snapshot(snapshot, path):
+    names = json.dumps({
+        'names': list(snapshot.users) + list(snapshot.proposals),
+        'expires_at': list(snapshot.expires_at),
+    }).encode('utf-8')
+    indptr = array('i', snapshot.indptr)
+    indices = array('i', snapshot.indices)
+    if sys.byteorder != 'little':
+        indptr.byteswap()
+        indices.byteswap()
+
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(HEADER.pack(snapshot.num_users, len(snapshot.proposals), len(indices), len(names)))
+        indptr.tofile(f)
+        indices.tofile(f)
+        f.write(names)
+
+
+def read_snapshot(path):
+    '''memory-maps the adjacency arrays, only the names are copied'''
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic = buffer[:len(MAGIC)]
+    if magic not in (MAGIC, MAGIC_WITHOUT_EXPIRY):
+        buffer.close()
+        raise ValueError('%s is not a graph snapshot' % path)
+
+    num_users, num_proposals, num_edges, names_length = HEADER.unpack_from(buffer, len(MAGIC))
+    offset = len(MAGIC) + HEADER.size
+    indptr_end = offset + 4 * (num_users + num_proposals + 1)
+    indices_end = indptr_end + 4 * num_edges
+
+    names = json.loads(buffer[indices_end:indices_end + names_length].decode('utf-8'))
+    expires_at = None
+    if magic == MAGIC:
+        names, expires_at = names['names'], names['expires_at']
+
+    if sys.byteorder != 'little':
+        indptr = array('i', buffer[offset:indptr_end])
+        indices = array('i', buffer[indptr_end:indices_end])
+        indptr.byteswap()
+        indices.byteswap()
+        buffer.close()
+        return Snapshot(names[:num_users], names[num_users:], indptr, indices, expires_at=expires_at)
+
+    view = memoryview(buffer)
+    indptr = view[offset:indptr_end].cast('i')
+    indices = view[indptr_end:indices_end].cast('i')
+    view.release()
+
+    return Snapshot(names[:num_users], names[num_users:], indptr, indices, buffer, expires_at)
+
+
+def _batches(rows, size):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def _run_batched(graph, statement, rows, batch_size):
+    '''each batch bumps the graph version in its own transaction, so
+    cached reads are invalidated as the import lands'''
+    for batch in _batches(rows, batch_size):
+        tx = graph.begin()
+        tx.run(bumping(statement), rows=batch)
+        tx.commit()
+
+
+def import_snapshot(graph, snapshot, batch_size=BATCH_SIZE):
+    '''merges a snapshot into the graph with one transaction per batch'''
+    graph.run("CREATE INDEX ON :user(name)")
+    graph.run("CREATE INDEX ON :proposal(name)")
+
+    _run_batched(graph, "UNWIND $rows AS name MERGE (:user {name: name})",
+                 list(snapshot.users), batch_size)
+    _run_batched(graph, "UNWIND $rows AS row MERGE (p:proposal {name: row[0]}) SET p.expires_at = row[1]",
+                 [[name, expiry] for name, expiry in zip(snapshot.proposals, snapshot.expires_at)], batch_size)
+
+    offers = []
+    needs = []
+    for kind, source, target in snapshot.edges():
+        (offers if kind == 'O' else needs).append([source, target])
+
+    _run_batched(graph, (
+        "UNWIND $rows AS row "
+        "MATCH (u:user {name: row[0]}), (p:proposal {name: row[1]}) "
+        "MERGE (u)-[:O]->(p)"
+    ), offers, batch_size)
+    _run_batched(graph, (
+        "UNWIND $rows AS row "
+        "MATCH (p:proposal {name: row[0]}), (u:user {name: row[1]}) "
+        "MERGE (p)-[:N]->(u)"
+    ), needs, batch_size)
@@ -0,0 +1,88 @@
+import snapshot
+import analysis
+
+
+# 1 -> 10 -> 2 -> 20 -> 1 is the only cycle, user 3 just makes an offer
+USERS = [1, 2, 3]
+PROPOSALS = [10, 20]
+OFFERS = [(1, 10), (2, 20), (3, 10)]
+NEEDS = [(10, 2), (20, 1)]
+
+
+class TestAnalysis(object):
+
+    @classmethod
+    def setup_class(cls):
+        cls.snapshot = snapshot.from_rows(USERS, PROPOSALS, OFFERS, NEEDS)
+
+    def test_strongly_connected_components(self):
+
+        labels, num_components = analysis.strongly_connected_components(self.snapshot)
+
+        assert num_components == 2
+        assert labels[0] == labels[1] == labels[3] == labels[4]
+        assert labels[2] != labels[0]
+
+    def test_cycles_through(self):
+
+        labels, _ = analysis.strongly_connected_components(self.snapshot)
+
+        assert list(analysis.cycles_through(self.snapshot, 0, labels)) == [[0, 3, 1, 4]]
+        assert list(analysis.cycles_through(self.snapshot, 2, labels)) == []
+
+    def test_canonical_cycles_are_counted_once(self):
+
+        labels, _ = analysis.strongly_connected_components(self.snapshot)
+
+        cycles = [cycle for node in range(self.snapshot.num_nodes)
+                  for cycle in analysis.cycles_through(self.snapshot, node, labels, canonical=True)]
+
+        assert len(cycles) == 1
+
+    def test_max_length(self):
+
+        labels, _ = analysis.strongly_connected_components(self.snapshot)
+
+        assert list(analysis.cycles_through(self.snapshot, 0, labels, max_length=3)) == []
+
+    def test_analyse(self, tmpdir):
+
+        path = str(tmpdir.join('graph.snap'))
+        snapshot.write_snapshot(self.snapshot, path)
+
+        stats = analysis.analyse(path, processes=1)
+
+        assert stats['non_trivial_components'] == 1
+        assert stats['largest_component'] == 4
+        assert stats['cycle_length_histogram'] == {4: 1}
+
+    def test_match_users(self, tmpdir):
+
+        path = str(tmpdir.join('graph.snap'))
+        snapshot.write_snapshot(self.snapshot, path)
+
+        matches = analysis.match_users(path, ['1', '3', 'unknown'], processes=1)
+
+        assert matches == {
+            '1': [{'match': [1, 10, 2, 20, 1]}],
+            '3': [],
+            'unknown': [],
+        }
+
+    def test_expired_proposals_break_matches(self, tmpdir):
+
+        path = str(tmpdir.join('graph.snap'))
+        snapshot.write_snapshot(snapshot.from_rows(USERS, PROPOSALS, OFFERS, NEEDS, [5.0, None]), path)
+
+        assert analysis.match_users(path, ['1'], processes=1, now=10.0) == {'1': []}
+        assert analysis.match_users(path, ['1'], processes=1, now=1.0) == {'1': [{'match': [1, 10, 2, 20, 1]}]}
+        assert analysis.analyse(path, processes=1, now=10.0)['cycles'] == 0
+
+    def test_a_user_needing_their_own_offer_is_not_a_match(self, tmpdir):
+
+        path = str(tmpdir.join('graph.snap'))
+        snapshot.write_snapshot(snapshot.from_rows(USERS, PROPOSALS, OFFERS, NEEDS + [(10, 1)]), path)
+
+        matches = analysis.match_users(path, ['1'], processes=1)
+
+        assert matches == {'1': [{'match': [1, 10, 2, 20, 1]}]}
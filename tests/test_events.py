@@ -0,0 +1,60 @@
+import json
+
+from events import MutationEvent, MutationFeed, FileSink, PROPOSAL_CREATED
+
+
+class TestMutationFeed(object):
+    '''uses its own feed, the app-wide one has subscribers that touch the graph'''
+
+    def setup_method(self, method):
+        self.feed = MutationFeed()
+
+    def test_subscribers_receive_published_events(self, app):
+
+        received = []
+        self.feed.subscribe(received.append)
+
+        event = self.feed.publish(PROPOSAL_CREATED, user_id='1', proposal_id='2', type='offer')
+        self.feed.unsubscribe(received.append)
+
+        assert received == [event]
+        assert event.type == PROPOSAL_CREATED
+        assert event.payload == {'user_id': '1', 'proposal_id': '2', 'type': 'offer'}
+
+    def test_sequence_numbers_increase(self, app):
+
+        first = self.feed.publish(PROPOSAL_CREATED)
+        second = self.feed.publish(PROPOSAL_CREATED)
+
+        assert second.seq == first.seq + 1
+
+    def test_failing_subscribers_do_not_raise(self, app):
+
+        received = []
+
+        def broken(event):
+            raise RuntimeError('subscriber is down')
+
+        self.feed.subscribe(broken)
+        self.feed.subscribe(received.append)
+        try:
+            event = self.feed.publish(PROPOSAL_CREATED, user_id='1', proposal_id='2', type='offer')
+        finally:
+            self.feed.unsubscribe(broken)
+            self.feed.unsubscribe(received.append)
+
+        assert received == [event]
+
+    def test_file_sink_appends_json_lines(self, tmpdir):
+
+        path = str(tmpdir.join('feed.log'))
+        sink = FileSink(path)
+
+        sink(MutationEvent(1, PROPOSAL_CREATED, 0.0, {'user_id': '1'}))
+        sink(MutationEvent(2, PROPOSAL_CREATED, 0.0, {'user_id': '2'}))
+
+        with open(path) as f:
+            lines = [json.loads(line) for line in f]
+
+        assert [line['seq'] for line in lines] == [1, 2]
+        assert lines[0]['payload'] == {'user_id': '1'}
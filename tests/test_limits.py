@@ -0,0 +1,57 @@
+import threading
+
+from mock import patch
+
+from limits import RouteLimit
+
+
+class TestRouteLimit(object):
+
+    def test_full_queue_is_refused_immediately(self):
+
+        limit = RouteLimit(1, 0, timeout=5)
+
+        assert limit.acquire()
+        assert not limit.acquire()
+
+        limit.release()
+        assert limit.acquire()
+
+    def test_waiting_request_gets_the_released_slot(self):
+
+        limit = RouteLimit(1, 1, timeout=5)
+        assert limit.acquire()
+
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(limit.acquire()))
+        waiter.start()
+        limit.release()
+        waiter.join()
+
+        assert results == [True]
+
+    def test_queue_timeout(self):
+
+        limit = RouteLimit(1, 1, timeout=0.01)
+        assert limit.acquire()
+
+        assert not limit.acquire()
+        assert limit.waiting == 0
+
+
+class TestConcurrencyLimiter(object):
+
+    def test_saturated_route_sheds_with_retry_after(self, app, client):
+
+        saturated = RouteLimit(1, 0, timeout=5)
+        assert saturated.acquire()
+
+        with patch.dict(app.extensions['concurrency_limits'], {'bp.list_proposal': saturated}):
+            response = client.get('/list_proposal')
+
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+
+    def test_unlimited_routes_are_untouched(self, app):
+
+        assert 'bp.create_proposal' not in app.extensions['concurrency_limits']
@@ -0,0 +1,66 @@
+import threading
+
+import pytest
+from mock import patch
+
+from factory import create_app
+from loadtest import GraphStandIn, UnknownStatement, Workload, client_sender, run_step
+
+
+CYCLE = ['/create_proposal/1/10/offer', '/create_proposal/2/10/need',
+         '/create_proposal/2/20/offer', '/create_proposal/1/20/need']
+
+
+class TestGraphStandIn(object):
+
+    @classmethod
+    def setup_class(cls):
+        cls.app = create_app({'TESTING': True, 'PY2NEO_GRAPH': GraphStandIn()})
+        cls.client = cls.app.test_client()
+
+    def test_match_through_the_app(self):
+
+        for path in CYCLE:
+            assert self.client.get(path).status_code == 200
+
+        response = self.client.get('/get_match/1')
+
+        assert response.status_code == 200
+        assert response.get_json() == [{'match': [1, 10, 2, 20, 1]}]
+
+    def test_failing_index_reload_falls_back_to_the_full_query(self):
+
+        app = create_app({'TESTING': True, 'PY2NEO_GRAPH': GraphStandIn()})
+        client = app.test_client()
+        for path in CYCLE:
+            client.get(path)
+
+        with patch('matching.load_graph', side_effect=KeyError(2)):
+            response = client.get('/get_match/1')
+            for thread in threading.enumerate():
+                if thread.name == 'match-index-reload':
+                    thread.join()
+
+        assert response.get_json() == [{'match': [1, 10, 2, 20, 1]}]
+        assert not app.extensions['match_index'].loaded
+
+    def test_list_proposal_hides_expired_proposals(self):
+
+        self.app.config['PY2NEO_GRAPH'].proposals[30] = 1.0
+
+        response = self.client.get('/list_proposal')
+
+        assert sorted(row['n']['name'] for row in response.get_json()) == [10, 20]
+
+    def test_unknown_statements_raise(self):
+
+        with pytest.raises(UnknownStatement):
+            GraphStandIn().run("MATCH (n) RETURN n")
+
+    def test_run_step(self):
+
+        result = run_step(client_sender(self.client), Workload(num_users=20, num_proposals=20, seed=1),
+                          rate=50, duration=0.5, workers=4)
+
+        assert result['errors'] == 0
+        assert sum(result['statuses'].values()) == 25
@@ -0,0 +1,65 @@
+import snapshot
+from events import MutationEvent, PROPOSAL_CREATED, PROPOSAL_DELETED
+from matching import ComponentIndex, edge_for
+
+
+def created(version, user_id, proposal_id, type):
+    return MutationEvent(version, PROPOSAL_CREATED, 0.0, dict(
+        user_id=user_id, proposal_id=proposal_id, type=type, version=version))
+
+
+class TestComponentIndex(object):
+
+    def setup_method(self, method):
+        self.index = ComponentIndex()
+        self.index.load(snapshot.from_rows([1, 2, 3], [10, 20], [(1, 10), (2, 20)], [(10, 2)]), 5)
+
+    def test_users_without_a_cycle_have_no_component(self):
+
+        assert self.index.component(1) == ([], [])
+        assert self.index.component(3) == ([], [])
+        assert self.index.component(4) == ([], [])
+
+    def test_closing_edge_merges_the_cycle(self):
+
+        self.index.add_edge(*edge_for('need', 1, 20))
+
+        users, proposals = self.index.component(1)
+
+        assert sorted(users) == [1, 2]
+        assert sorted(proposals) == [10, 20]
+        assert self.index.component(3) == ([], [])
+
+    def test_new_nodes_are_picked_up(self):
+
+        self.index.add_edge(*edge_for('offer', 4, 30))
+        self.index.add_edge(*edge_for('need', 4, 30))
+
+        users, proposals = self.index.component(4)
+
+        assert users == [4]
+        assert proposals == [30]
+
+    def test_untrusted_at_other_versions(self):
+
+        assert ComponentIndex().component(1, 0) is None
+        assert self.index.component(1, 6) is None
+        assert self.index.component(1, 5) == ([], [])
+
+    def test_events_move_the_version_in_order(self):
+
+        self.index.apply(created(7, 4, 30, 'offer'))
+        assert self.index.version == 5
+
+        self.index.apply(MutationEvent(6, PROPOSAL_DELETED, 0.0, dict(proposal_id=40, version=6)))
+        assert self.index.version == 7
+        assert ('proposal', 30) in self.index.successors[('user', 4)]
+
+    def test_events_during_a_load_are_replayed(self):
+
+        self.index._pending = []
+        self.index.apply(created(6, 1, 20, 'need'))
+        self.index.load(snapshot.from_rows([1, 2, 3], [10, 20], [(1, 10), (2, 20)], [(10, 2)]), 5)
+
+        assert self.index.version == 6
+        assert sorted(self.index.component(1, 6)[0]) == [1, 2]
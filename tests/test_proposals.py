@@ -0,0 +1,33 @@
+from mock import MagicMock
+
+from proposals import expires_at, sweep_expired
+
+
+class TestProposalExpiry(object):
+
+    def test_expires_at(self):
+
+        assert expires_at(None) is None
+        assert expires_at(60, now=1000) == 1060
+
+    def test_sweep_runs_batches_until_a_short_one(self):
+
+        graph = MagicMock()
+        graph.run.return_value.data.side_effect = [
+            [{'names': [1, 2], 'version': 8}],
+            [{'names': [3, 4], 'version': 9}],
+            [{'names': [5], 'version': 10}],
+        ]
+
+        assert list(sweep_expired(graph, batch_size=2, now=1000)) == [
+            ([1, 2], 8), ([3, 4], 9), ([5], 10)]
+        assert graph.run.call_count == 3
+        assert graph.run.call_args[1] == {'now': 1000, 'batch_size': 2}
+
+    def test_sweep_with_nothing_expired(self):
+
+        graph = MagicMock()
+        graph.run.return_value.data.return_value = [{'names': [], 'version': 7}]
+
+        assert list(sweep_expired(graph, now=1000)) == []
+        assert graph.run.call_count == 1
@@ -0,0 +1,87 @@
+import time
+
+from mock import MagicMock, PropertyMock, patch
+
+from extensions import db, feed
+from routing import Replica, ReplicaPool
+
+
+class FakeReplica(object):
+
+    host = 'fake'
+
+    def __init__(self, healthy):
+        self.graph = MagicMock()
+        self.healthy = healthy
+
+    def available(self, interval):
+        return self.graph if self.healthy else None
+
+    def check(self, logger):
+        pass
+
+
+class TestReplica(object):
+
+    def test_unreachable_replica_fails_its_check(self):
+
+        logger = MagicMock()
+        replica = Replica('127.0.0.1', {'http_port': 1}, 0.5)
+
+        replica.check(logger)
+
+        assert not replica.healthy
+        assert replica.available(10) is None
+        assert logger.warning.called
+
+    def test_checks_that_stop_coming_age_out(self):
+
+        replica = Replica('127.0.0.1', {}, 0.5)
+        replica.graph = MagicMock()
+        replica.healthy = True
+        replica.checked_at = time.time()
+
+        assert replica.available(10) is replica.graph
+
+        replica.checked_at -= 30
+
+        assert replica.available(10) is None
+
+
+class TestReplicaPool(object):
+
+    def test_round_robin_skips_unhealthy_replicas(self):
+
+        replicas = [FakeReplica(True), FakeReplica(False), FakeReplica(True)]
+        pool = ReplicaPool(replicas, 10, MagicMock())
+
+        chosen = [pool.next() for _ in range(4)]
+
+        assert chosen == [replicas[0].graph, replicas[2].graph, replicas[0].graph, replicas[2].graph]
+
+    def test_no_healthy_replica(self):
+
+        assert ReplicaPool([FakeReplica(False)], 10, MagicMock()).next() is None
+
+
+@patch('routing.RoutingPy2Neo.graph', new_callable=PropertyMock)
+class TestReadRouting(object):
+    '''each test pushes its own app context: the session fixture keeps one
+    pushed, and request contexts would otherwise share its `g`'''
+
+    def test_reads_go_to_the_primary_without_replicas(self, graph_patch, app):
+
+        with app.app_context(), app.test_request_context():
+            assert db.read_graph is graph_patch.return_value
+
+    def test_a_request_sticks_to_one_replica_until_it_writes(self, graph_patch, app):
+
+        replicas = [FakeReplica(True), FakeReplica(True)]
+        with patch.dict(app.extensions, {'py2neo_replicas': ReplicaPool(replicas, 10, MagicMock())}):
+            with app.app_context(), app.test_request_context():
+                assert db.read_graph is replicas[0].graph
+                assert db.read_graph is replicas[0].graph
+
+                feed.publish('test_write')
+
+                assert db.read_graph is graph_patch.return_value
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+import serializers
+from schemas import Match, Proposal, ProposalRow, ValidationError, parse_id, parse_proposal
+
+
+class TestSchemas(object):
+
+    def test_parse_proposal(self):
+
+        proposal = parse_proposal(1, 2, 'offer', '30')
+
+        assert proposal.user_id == 1
+        assert proposal.proposal_id == 2
+        assert proposal.type == 'offer'
+        assert proposal.ttl == 30.0
+
+    @pytest.mark.parametrize('args', [
+        (1, 2, 'gift'),
+        (1, 2, 'need', '-5'),
+        (1, 2, 'need', 'soon'),
+        (1, 2, 'need', 'nan'),
+        (1, 2, 'need', 'inf'),
+    ])
+    def test_parse_proposal_rejects_bad_input(self, args):
+
+        with pytest.raises(ValidationError):
+            parse_proposal(*args)
+
+    def test_parse_id(self):
+
+        assert parse_id('42', 'user_id') == 42
+        assert parse_id('-7', 'user_id') == -7
+        assert parse_id(str(2 ** 63 - 1), 'user_id') == 2 ** 63 - 1
+        assert parse_id(str(-2 ** 63), 'user_id') == -2 ** 63
+
+    @pytest.mark.parametrize('value', [
+        'bob', '2 OR 1=1', ' 1', '1_000', '1\n', '\u0661', '1.5', '', 1,
+        str(2 ** 63), str(-2 ** 63 - 1), '99999999999999999999999',
+    ])
+    def test_parse_id_rejects_bad_input(self, value):
+
+        with pytest.raises(ValidationError):
+            parse_id(value, 'user_id')
+
+
+class TestSerializers(object):
+
+    PAYLOAD = [ProposalRow(Proposal(1)), Match([1, 10, 2, 20, 1])]
+    EXPECTED = [{'n': {'name': 1, 'expires_at': None}}, {'match': [1, 10, 2, 20, 1]}]
+
+    def test_dumps(self):
+
+        assert json.loads(serializers.dumps(self.PAYLOAD)) == self.EXPECTED
+
+    def test_dumps_without_orjson(self, monkeypatch):
+
+        monkeypatch.setattr(serializers, 'orjson', None)
+
+        assert json.loads(serializers.dumps(self.PAYLOAD)) == self.EXPECTED
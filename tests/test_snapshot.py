@@ -0,0 +1,107 @@
+from array import array
+
+import pytest
+from mock import MagicMock
+
+import snapshot
+
+
+USERS = [1, 2, 3]
+PROPOSALS = [10, 20]
+OFFERS = [(1, 10), (2, 20), (3, 10)]
+NEEDS = [(10, 2), (20, 1)]
+
+
+class TestSnapshot(object):
+
+    def test_csr_layout_puts_users_first(self):
+
+        graph_snapshot = snapshot.from_rows(USERS, PROPOSALS, OFFERS, NEEDS)
+
+        assert graph_snapshot.num_nodes == 5
+        assert graph_snapshot.num_edges == 5
+        assert graph_snapshot.neighbours(0) == (3,)
+        assert graph_snapshot.neighbours(3) == (1,)
+
+    def test_load_graph_keeps_edges_to_nodes_it_read_too_early(self):
+
+        graph = MagicMock()
+        graph.run.return_value.data.side_effect = [
+            [{'name': 1}], [{'name': 10, 'expires_at': None}],
+            [{'src': 1, 'dst': 10, 'expires_at': None}, {'src': 2, 'dst': 20, 'expires_at': 50.0}],
+            [{'src': 20, 'dst': 1, 'expires_at': 50.0}]]
+
+        loaded = snapshot.load_graph(graph, now=10.0)
+
+        assert loaded.users == [1, 2]
+        assert loaded.proposals == [10, 20]
+        assert loaded.expires_at == [None, 50.0]
+        assert sorted(loaded.edges()) == [('N', 20, 1), ('O', 1, 10), ('O', 2, 20)]
+        assert all(call[1] == {'now': 10.0} for call in graph.run.call_args_list[1:])
+
+    def test_round_trip(self, tmpdir):
+
+        path = str(tmpdir.join('graph.snap'))
+        snapshot.write_snapshot(snapshot.from_rows(USERS, PROPOSALS, OFFERS, NEEDS), path)
+
+        graph_snapshot = snapshot.read_snapshot(path)
+
+        assert graph_snapshot.users == USERS
+        assert graph_snapshot.proposals == PROPOSALS
+        assert sorted(graph_snapshot.edges()) == sorted(
+            [('O', u, p) for u, p in OFFERS] + [('N', p, u) for p, u in NEEDS])
+
+        graph_snapshot.close()
+
+    def test_expiries_round_trip(self, tmpdir):
+
+        path = str(tmpdir.join('graph.snap'))
+        snapshot.write_snapshot(snapshot.from_rows(USERS, PROPOSALS, OFFERS, NEEDS, [5.0, None]), path)
+
+        graph_snapshot = snapshot.read_snapshot(path)
+
+        assert graph_snapshot.expires_at == [5.0, None]
+        assert list(graph_snapshot.alive(now=10.0)) == [1, 1, 1, 0, 1]
+        graph_snapshot.close()
+
+    def test_reads_files_without_expiries(self, tmpdir):
+
+        path = tmpdir.join('old.snap')
+        names = b'[1, 10]'
+        path.write_binary(snapshot.MAGIC_WITHOUT_EXPIRY + snapshot.HEADER.pack(1, 1, 1, len(names)) +
+                          bytes(array('i', [0, 1, 1]) + array('i', [1])) + names)
+
+        graph_snapshot = snapshot.read_snapshot(str(path))
+
+        assert graph_snapshot.proposals == [10]
+        assert graph_snapshot.expires_at == [None]
+        graph_snapshot.close()
+
+    def test_import_keeps_expiries(self):
+
+        graph = MagicMock()
+
+        snapshot.import_snapshot(graph, snapshot.from_rows(USERS, PROPOSALS, OFFERS, NEEDS, [5.0, None]))
+
+        proposal_rows = [call[1]['rows'] for call in graph.begin.return_value.run.call_args_list
+                         if 'SET p.expires_at' in call[0][0]]
+        assert proposal_rows == [[[10, 5.0], [20, None]]]
+
+    def test_close_with_neighbours_still_referenced(self, tmpdir):
+
+        path = str(tmpdir.join('graph.snap'))
+        snapshot.write_snapshot(snapshot.from_rows(USERS, PROPOSALS, OFFERS, NEEDS), path)
+
+        graph_snapshot = snapshot.read_snapshot(path)
+        neighbours = graph_snapshot.neighbours(0)
+        graph_snapshot.close()
+
+        assert neighbours == (3,)
+
+    def test_read_rejects_other_files(self, tmpdir):
+
+        path = tmpdir.join('not-a-snapshot')
+        path.write('hello world, this is not a snapshot')
+
+        with pytest.raises(ValueError):
+            snapshot.read_snapshot(str(path))
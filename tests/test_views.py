@@ -0,0 +1,106 @@
+import pytest
+from mock import PropertyMock, patch
+
+from extensions import graph_version
+
+
+VERSION = 7
+
+
+@patch.object(graph_version, 'current', return_value=VERSION)
+class TestProposalValidation(object):
+
+    @patch('views.db')
+    def test_unknown_type_is_rejected(self, db_patch, current_patch, client):
+
+        response = client.get('/create_proposal/1/2/gift')
+
+        assert response.status_code == 400
+        assert 'type' in response.get_json()['error']
+        assert not db_patch.mock_calls
+
+    @patch('views.db')
+    def test_non_integer_ids_are_rejected(self, db_patch, current_patch, client):
+
+        response = client.get('/get_match/bob')
+
+        assert response.status_code == 400
+        assert not db_patch.mock_calls
+
+
+class TestUnpatchedValidation(object):
+
+    @patch('routing.RoutingPy2Neo.read_graph', new_callable=PropertyMock)
+    def test_bad_ids_are_rejected_before_the_version_is_read(self, read_graph_patch, client):
+
+        response = client.get('/get_match/bob', headers={'If-None-Match': '"7-json"'})
+
+        assert response.status_code == 400
+        assert 'user_id' in response.get_json()['error']
+        assert not read_graph_patch.called
+
+
+@patch.object(graph_version, 'current', return_value=VERSION)
+class TestContentNegotiation(object):
+
+    def test_json_by_default(self, current_patch, client):
+
+        response = client.get('/get_match/bob')
+
+        assert response.mimetype == 'application/json'
+        assert 'Accept' in response.headers['Vary']
+
+    def test_msgpack_when_accepted(self, current_patch, client):
+
+        msgpack = pytest.importorskip('msgpack')
+
+        response = client.get('/get_match/bob', headers={'Accept': 'application/x-msgpack'})
+
+        assert response.mimetype == 'application/x-msgpack'
+        assert 'user_id' in msgpack.unpackb(response.data, raw=False)['error']
+
+    @patch('views.db')
+    def test_msgpack_lists_are_streamed(self, db_patch, current_patch, client):
+
+        msgpack = pytest.importorskip('msgpack')
+        db_patch.read_graph.run.return_value.data.return_value = [
+            {'name': 1, 'expires_at': None}, {'name': 2, 'expires_at': 5.0}]
+
+        response = client.get('/list_proposal', headers={'Accept': 'application/x-msgpack'})
+
+        assert response.is_streamed
+        assert msgpack.unpackb(response.data, raw=False) == [
+            {'n': {'name': 1, 'expires_at': None}}, {'n': {'name': 2, 'expires_at': 5.0}}]
+
+
+@patch.object(graph_version, 'current', return_value=VERSION)
+class TestConditionalRequests(object):
+
+    @patch('views.db')
+    def test_responses_carry_validators(self, db_patch, current_patch, client):
+
+        db_patch.read_graph.run.return_value.data.return_value = [{'name': 1, 'expires_at': None}]
+
+        response = client.get('/list_proposal')
+
+        assert response.status_code == 200
+        assert response.headers['ETag'] == '"7-json"'
+        assert 'Last-Modified' not in response.headers
+
+    @patch('views.db')
+    def test_matching_etag_skips_the_query(self, db_patch, current_patch, client):
+
+        response = client.get('/list_proposal', headers={'If-None-Match': '"7-json"'})
+
+        assert response.status_code == 304
+        assert not db_patch.read_graph.run.called
+
+    @patch('views.db')
+    def test_stale_etag_runs_the_query(self, db_patch, current_patch, client):
+
+        db_patch.read_graph.run.return_value.data.return_value = []
+
+        response = client.get('/list_proposal', headers={'If-None-Match': '"6-json"'})
+
+        assert response.status_code == 200
+        assert db_patch.read_graph.run.called
@@ -0,0 +1,25 @@
+'''the :graph_version counter that every write moves
+
+kept apart from caching so the offline snapshot tools can bump it
+without importing flask
+'''
+
+
+# appended to a write statement so the write and the bump commit in the
+# same transaction: nothing can change the graph without moving the
+# version, and a failed bump means a failed write rather than a stale one
+BUMP_VERSION = (
+    " WITH count(*) AS writes "
+    "MERGE (v:graph_version) "
+    "SET v.value = coalesce(v.value, 0) + 1 "
+    "RETURN v.value AS version"
+)
+
+
+def bumping(statement):
+    '''`statement` must not RETURN anything itself, its result becomes the new version'''
+    return statement + BUMP_VERSION
+
+
+def read_version(graph):
+    return graph.run("MATCH (v:graph_version) RETURN v.value AS value").evaluate() or 0
@@ -1,27 +1,98 @@
-from flask import Blueprint, jsonify
-from extensions import db
+import time
+
+from flask import Blueprint, current_app, g, request
+from extensions import db, feed, match_index, graph_version
+from versioning import bumping
+from events import PROPOSAL_CREATED, PROPOSAL_DELETED, PROPOSAL_WITHDRAWN
+from proposals import expires_at
+from schemas import OFFER, Match, Proposal, ProposalRow, ValidationError, parse_id, parse_proposal
+from serializers import render
 
 bp = Blueprint('bp', __name__)
 
 
+@bp.errorhandler(ValidationError)
+def validation_error(error):
+    return render({'error': str(error)}, status=400)
+
+
+@bp.url_value_preprocessor
+def parse_ids(endpoint, values):
+    # runs before a view and all of its decorators, so a bad id is a 400
+    # before anything reads the graph, conditional requests included
+    for field in ('user_id', 'proposal_id'):
+        if values and field in values:
+            values[field] = parse_id(values[field], field)
+
+
 @bp.route('/create_proposal/<string:user_id>/<string:proposal_id>/<string:type>')
 def create_proposal(user_id, proposal_id, type):
-    if type == 'offer':
-        db.graph.run("MERGE (U1:user{name:%s}) MERGE (R:proposal{name:%s}) MERGE m=(U1)-[:O]->(R)" % (
-            user_id, proposal_id))
-        return jsonify('proposal %s created' % user_id)
-    elif type == 'need':
-        db.graph.run("MERGE (U:user{name:%s}) MERGE (R:proposal{name:%s}) MERGE m=(R)-[:N]->(U)" % (
-            user_id, proposal_id))
-        return jsonify('proposal %s created' % user_id)
+    proposal = parse_proposal(user_id, proposal_id, type,
+                              request.args.get('ttl', current_app.config['PROPOSAL_TTL']))
+    expiry = expires_at(proposal.ttl)
+    set_expiry = " SET R.expires_at = $expires_at" if expiry is not None else ""
+    if proposal.type == OFFER:
+        statement = "MERGE (U1:user{name:$user_id}) MERGE (R:proposal{name:$proposal_id}) MERGE m=(U1)-[:O]->(R)"
+    else:
+        statement = "MERGE (U:user{name:$user_id}) MERGE (R:proposal{name:$proposal_id}) MERGE m=(R)-[:N]->(U)"
+    version = db.graph.run(bumping(statement + set_expiry), user_id=proposal.user_id,
+                           proposal_id=proposal.proposal_id, expires_at=expiry).evaluate()
+    feed.publish(PROPOSAL_CREATED, user_id=proposal.user_id, proposal_id=proposal.proposal_id,
+                 type=proposal.type, version=version)
+    return render('proposal %s created' % proposal.user_id)
+
+
+@bp.route('/delete_proposal/<string:proposal_id>')
+def delete_proposal(proposal_id):
+    version = db.graph.run(bumping("MATCH (R:proposal{name:$proposal_id}) DETACH DELETE R"),
+                           proposal_id=proposal_id).evaluate()
+    feed.publish(PROPOSAL_DELETED, proposal_id=proposal_id, version=version)
+    return render('proposal %s deleted' % proposal_id)
+
+
+@bp.route('/withdraw_proposal/<string:user_id>/<string:proposal_id>')
+def withdraw_proposal(user_id, proposal_id):
+    version = db.graph.run(bumping("MATCH (U:user{name:$user_id})-[r:O|N]-(R:proposal{name:$proposal_id}) DELETE r"),
+                           user_id=user_id, proposal_id=proposal_id).evaluate()
+    feed.publish(PROPOSAL_WITHDRAWN, user_id=user_id, proposal_id=proposal_id, version=version)
+    return render('proposal %s withdrawn by %s' % (proposal_id, user_id))
 
 
 @bp.route('/get_match/<string:user_id>')
+@graph_version.conditional
 def get_match(user_id):
-    return jsonify(db.graph.run(
-        "MATCH m=(a:user)-[:O]->()-[*]->()-[:N]->(a:user) WHERE a.name=%s RETURN [n in nodes(m)|n.name] as match" % user_id).data())
+    component = None
+    if current_app.config['MATCH_SCC_PREFILTER']:
+        # the conditional wrapper has read the version already, unless it is switched off
+        version = g.get('graph_version')
+        if version is None:
+            version = graph_version.current()
+        component = match_index.component(user_id, version, db.read_graph)
+
+    # None means the index is behind and cannot rule anything out. a large
+    # component is not worth filtering on, the IN lookups cost more than they prune
+    if component is None or len(component[0]) + len(component[1]) > current_app.config['MATCH_COMPONENT_FILTER_LIMIT']:
+        return render([Match(row['match']) for row in db.read_graph.run((
+            "MATCH m=(a:user)-[:O]->()-[*]->()-[:N]->(a:user) WHERE a.name=$user_id "
+            "AND all(n in nodes(m) WHERE NOT n:proposal OR n.expires_at IS NULL OR n.expires_at > $now) "
+            "RETURN [n in nodes(m)|n.name] as match"
+        ), user_id=user_id, now=time.time()).data()])
+
+    users, proposals = component
+    if not users:
+        return render([])
+
+    return render([Match(row['match']) for row in db.read_graph.run((
+        "MATCH m=(a:user)-[:O]->()-[*]->()-[:N]->(a:user) WHERE a.name=$user_id "
+        "AND all(n in nodes(m) WHERE (n:user AND n.name IN $users) OR (n:proposal AND n.name IN $proposals)) "
+        "AND all(n in nodes(m) WHERE NOT n:proposal OR n.expires_at IS NULL OR n.expires_at > $now) "
+        "RETURN [n in nodes(m)|n.name] as match"
+    ), user_id=user_id, users=users, proposals=proposals, now=time.time()).data()])
 
 
 @bp.route('/list_proposal')
+@graph_version.conditional
 def list_proposal():
-    return jsonify(db.graph.run("MATCH (n:proposal) RETURN n LIMIT 25").data())
+    return render([ProposalRow(Proposal(row['name'], row['expires_at'])) for row in db.read_graph.run(
+        "MATCH (n:proposal) WHERE n.expires_at IS NULL OR n.expires_at > $now "
+        "RETURN n.name AS name, n.expires_at AS expires_at LIMIT 25", now=time.time()).data()])